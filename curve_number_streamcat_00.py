@@ -1,7 +1,6 @@
 from decimal import Decimal
 import sqlite3
 import concurrent.futures
-import asyncio
 import requests
 import json
 import csv
@@ -34,9 +33,36 @@ def update_database():
         update_query = "ALTER TABLE PlusFlowlineVAA ADD CurveNumber DECIMAL(10, 5)"
         c.execute(update_query)
         conn.commit()
+    index_query = "CREATE INDEX IF NOT EXISTS PlusFlowlineVAA_CurveNumber ON PlusFlowlineVAA (CurveNumber)"
+    c.execute(index_query)
     conn.close()
 
 
+def update_curvenumbers(conn, curve_numbers):
+    """
+    Stages a batch of calculated curve numbers in a temp table and applies them to PlusFlowlineVAA with a single update.
+    :param conn: database connection
+    :param curve_numbers: list of (comid, curve number) tuples
+    :return: None
+    """
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS CurveNumberStage "
+              "(ComID INTEGER PRIMARY KEY, CurveNumber DECIMAL(10, 5))")
+    c.execute("BEGIN TRANSACTION")
+    c.execute("DELETE FROM CurveNumberStage")
+    c.executemany("INSERT OR REPLACE INTO CurveNumberStage (ComID, CurveNumber) VALUES (?, ?)", curve_numbers)
+    if sqlite3.sqlite_version_info >= (3, 33, 0):
+        update_query = "UPDATE PlusFlowlineVAA SET CurveNumber = s.CurveNumber FROM CurveNumberStage AS s " \
+                       "WHERE PlusFlowlineVAA.ComID = s.ComID"
+    else:
+        # UPDATE ... FROM requires sqlite 3.33
+        update_query = "UPDATE PlusFlowlineVAA SET CurveNumber = " \
+                       "(SELECT s.CurveNumber FROM CurveNumberStage AS s WHERE s.ComID = PlusFlowlineVAA.ComID) " \
+                       "WHERE ComID IN (SELECT ComID FROM CurveNumberStage)"
+    c.execute(update_query)
+    c.execute("COMMIT")
+
+
 def import_mapping():
     """
     Imports the nlcd 2011 curve number mapping csv located at mapping_file.
@@ -94,7 +120,7 @@ class CurveNumber:
     Calculate the curve number for a specified comid catchment
     Reference landcover from nlcd 2011 data: https://www.mrlc.gov/nlcd11_leg.php
     """
-    def __init__(self, _comid):
+    def __init__(self, _comid, add_to_db=True):
         self.catchment = Catchment(_comid)  # Catchment object
         self.landcover = None               # NLCD landcover data for the catchment
         self.soil = None                    # Statsgo soil data for the catchment
@@ -103,7 +129,8 @@ class CurveNumber:
         self.calculate_hsg()                # Function to calculate hydrologic soil group
         self.curve_number = None            # Catchments calculated curve number value
         self.calculate_curvenumber()        # Function to calculate curve number
-        self.add_to_database()              # Add curve number to database for catchment
+        if add_to_db:
+            self.add_to_database()          # Add curve number to database for catchment
 
     def set_catchment_data(self):
         """
@@ -228,6 +255,31 @@ def cn_calculation_catchment(comid):
 
 
 executor = concurrent.futures.ThreadPoolExecutor(max_workers=6)
+batch_size = 1000
+
+
+def calculate_catchment(comid):
+    """
+    Calculate curve number for a single catchment, without adding it to the database
+    :param comid: Catchment comid
+    :return: CurveNumber object, None if the calculation failed
+    """
+    try:
+        return CurveNumber(comid, add_to_db=False)
+    except Exception as e:
+        print("Curve Number Error: COMID: {}; {}".format(comid, e))
+        return None
+
+
+def calculate_batch(comids):
+    """
+    Calculate curve number for a batch of catchments, without adding them to the database.
+    Failed catchments are excluded, leaving their CurveNumber NULL to be retried on the next run.
+    :param comids: list of catchment comids
+    :return: list of (comid, curve number) tuples
+    """
+    results = executor.map(calculate_catchment, comids)
+    return [(cn.catchment._comid, float(cn.curve_number)) for cn in results if cn is not None]
 
 
 def cn_calculation_conus():
@@ -238,13 +290,18 @@ def cn_calculation_conus():
     update_database()
     conn = get_db_connection()
     c = conn.cursor()
-    comid_query = "SELECT ComID, CurveNumber FROM PlusFlowlineVAA WHERE CurveNumber IS NULL"
+    comid_query = "SELECT ComID FROM PlusFlowlineVAA WHERE CurveNumber IS NULL"
     comid_inputs = []
     for comid in c.execute(comid_query):
         comid_inputs.append(comid[0])
-    loop = asyncio.get_event_loop()
-    futures = [loop.run_in_executor(executor, CurveNumber, cid) for cid in comid_inputs]
-    asyncio.gather(*futures)
+    total = len(comid_inputs)
+    for i in range(0, total, batch_size):
+        start_t = time.time()
+        curve_numbers = calculate_batch(comid_inputs[i:i + batch_size])
+        update_curvenumbers(conn, curve_numbers)
+        end_t = time.time()
+        print("Completed: {}/{}, Batch Time: {} sec".format(min(i + batch_size, total), total,
+                                                              round(end_t - start_t, 3)))
     conn.close()
 
 
@@ -2,7 +2,7 @@ from decimal import Decimal
 import sqlite3
 # import concurrent.futures
 # import asyncio
-# import numpy as np
+import numpy as np
 # import requests
 import json
 import csv
@@ -10,6 +10,9 @@ import csv
 from ftplib import FTP
 from zipfile import ZipFile
 import os
+from region_index import RegionIndex
+from curvenumber_stats import CurveNumberStatistics
+from ndvi_cube import NDVICube, NDVIRow, cube_current, ndvi_cube_path
 
 
 # Steps
@@ -36,6 +39,13 @@ curvenumbers = json.loads(open_file("curvenumber.json"))
 curvenumber_conditions = json.loads(open_file("curvenumber_conditions.json"))
 curvenumber_ndvi = json.loads(open_file("curvenumber_ndvi.json"))
 
+# Statistics calculated for each catchment and added to CurveNumberStats/CurveNumberAnnual, None: not calculated.
+# See curvenumber_stats.default_statistics for the available statistics.
+curvenumber_statistics = None
+# Year of the first ndvi timestep, used for the CurveNumberAnnual years. The catchment ndvi files (csv and cube)
+# start at 2001 with 23 timesteps per year, the timestep column names are not parsed for the year.
+curvenumber_start_year = 2001
+
 ndvi_data = {}
 region_nlcd = {}
 region_statsgo = {}
@@ -51,7 +61,7 @@ def get_db_connection():
     return conn
 
 
-def get_streamcat_data(files):
+def get_streamcat_data(files, import_data=True):
     print("Importing epa streamcat files...")
     for sfile, file in files.items():
         ofile = "Data/{}".format(file)
@@ -72,6 +82,8 @@ def get_streamcat_data(files):
             print("Extracting {}".format(ofile))
             with ZipFile(ofile) as zipfile:
                 zipfile.extractall("Data")
+    if not import_data:
+        return
     for file in files.keys():
         if "NLCD2011" in file:
             print("Importing {} to region_nlcd".format(file))
@@ -96,15 +108,239 @@ def get_streamcat_data(files):
     print("Completed import of streamcat files.")
 
 
-class Catchment:
+nlcd_classes = ["11", "12", "21", "22", "23", "24", "31", "41", "42", "43",
+                "51", "52", "71", "72", "73", "74", "81", "82", "90", "95"]
+ndvi_classes = ["41", "42", "43", "52", "71", "81", "82"]
+hsg_codes = ["A", "B", "C", "D"]
+soil_types = ["clay", "sand"]
+timestep_periods = 23
+condition_classes = ["POOR", "FAIR", "GOOD"]
+
+
+class CurveNumberTables:
+    """
+    Curve number tables (curvenumber.json, curvenumber_conditions.json, curvenumber_ndvi.json) for one or more
+    scenarios, as arrays with a leading scenario axis.
+    curvenumbers: (scenario, nlcd class, hsg), conditions: (scenario, nlcd class, condition, hsg),
+    thresholds: (scenario, nlcd class, [POOR, GOOD])
+    """
+
+    def __init__(self, scenarios):
+        """
+        :param scenarios: dictionary of scenario name to a (curvenumbers, conditions, ndvi thresholds) tuple of
+        table dictionaries, in the format of the json table files.
+        """
+        self.names = list(scenarios.keys())
+        shape = (len(self.names), len(nlcd_classes))
+        self.curvenumbers = np.full(shape + (len(hsg_codes),), -1.0)
+        self.conditions = np.full(shape + (len(condition_classes), len(hsg_codes)), -1.0)
+        self.thresholds = np.zeros(shape + (2,))
+        for s, name in enumerate(self.names):
+            _curvenumbers, _conditions, _ndvi = scenarios[name]
+            for c, k in enumerate(nlcd_classes):
+                if k in _curvenumbers:
+                    self.curvenumbers[s, c] = [float(_curvenumbers[k][h]) for h in hsg_codes]
+                if k in ndvi_classes:
+                    for j, condition in enumerate(condition_classes):
+                        self.conditions[s, c, j] = [float(_conditions[k][condition][h]) for h in hsg_codes]
+                    self.thresholds[s, c] = [float(_ndvi[k]["POOR"]), float(_ndvi[k]["GOOD"])]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def load_scenarios(scenarios):
+    """
+    Load the curve number tables for each scenario.
+    :param scenarios: dictionary of scenario name to a dictionary of table file paths, with keys curvenumber,
+    conditions and ndvi. Tables not specified use the default table files.
+    :return: CurveNumberTables
+    """
+    tables = {}
+    for name, files in scenarios.items():
+        tables[name] = (json.loads(open_file(files.get("curvenumber", "curvenumber.json"))),
+                        json.loads(open_file(files.get("conditions", "curvenumber_conditions.json"))),
+                        json.loads(open_file(files.get("ndvi", "curvenumber_ndvi.json"))))
+    return CurveNumberTables(tables)
+
+
+def curvenumber_series(landcover, hsg, ndvi, tables):
+    """
+    Calculate the curve number timestep series of a catchment for each scenario in tables.
+    :param landcover: landcover vector, ordered by nlcd_classes
+    :param hsg: hydrologic soil group index into hsg_codes
+    :param ndvi: ndvi timestep series
+    :param tables: CurveNumberTables
+    :return: array of curve numbers (scenario, timestep), -1 where no curve number could be calculated
+    """
+    ndvi = ndvi.astype(np.float64)
+    cn = np.zeros((len(tables), ndvi.size))
+    for c, (k, v) in enumerate(zip(nlcd_classes, landcover.astype(np.float64))):
+        # k: nlcd class
+        # v: percent value
+        # v = -1: not applicable
+        if v == -1:
+            continue
+        if k not in ndvi_classes:
+            k_cn = tables.curvenumbers[:, c, hsg][:, None]
+            cn = cn + np.where(k_cn != -1, k_cn * v / 100, 0)
+        else:
+            poor = tables.thresholds[:, c, 0][:, None]
+            good = tables.thresholds[:, c, 1][:, None]
+            condition = np.where(ndvi <= poor, 0, np.where(ndvi < good, 1, 2))
+            k_cn = np.take_along_axis(tables.conditions[:, c, :, hsg], condition, axis=1)
+            valid = (ndvi != -9998) & (k_cn != -1)
+            cn = cn + np.where(valid, k_cn * v / 100, 0)
+    # no valid landcover or request to streamCat produced no data
+    cn[cn == 0] = -1
+    cn[(0 < cn) & (cn < 30)] = 30
+    return cn
+
+
+def curvenumber_period_avg(cn):
+    """
+    Average the valid curve numbers of a timestep series for each of the timestep periods.
+    :param cn: array of curve numbers, timesteps on the last axis
+    :return: array of period averages, periods on the last axis, nan for periods without a valid curve number
+    """
+    t = cn.shape[-1]
+    years = -(-t // timestep_periods)
+    padded = np.full(cn.shape[:-1] + (years * timestep_periods,), -1.0)
+    padded[..., :t] = cn
+    padded = padded.reshape(cn.shape[:-1] + (years, timestep_periods))
+    valid = padded != -1
+    count = valid.sum(axis=-2)
+    cn_sum = np.where(valid, padded, 0).sum(axis=-2)
+    cn_avg = np.full(count.shape, np.nan)
+    np.divide(cn_sum, count, out=cn_avg, where=count > 0)
+    return cn_avg
+
+
+base_tables = CurveNumberTables({"base": (curvenumbers, curvenumber_conditions, curvenumber_ndvi)})
+
+
+def restore_catchment_record(cls, comid, region, valid_catchment, hsg, landcover, soil, ndvi, curve_number,
+                             curve_number_avg, curve_number_stats):
+    """
+    Rebuild a catchment record from its pickled state, without running the catchment calculations.
+    """
+    record = cls.__new__(cls)
+    record.comid = comid
+    record.region = region
+    record.valid_catchment = valid_catchment
+    record._hsg = hsg
+    record._landcover = landcover
+    record._soil = soil
+    record._ndvi = ndvi
+    record._curve_number = curve_number
+    record._curve_number_avg = curve_number_avg
+    record.curve_number_stats = curve_number_stats
+    return record
+
+
+class CatchmentRecord:
+    """
+    Compact array backed catchment record.
+    landcover: float64 vector ordered by nlcd_classes, -1: not applicable
+    soil: float64 vector ordered by soil_types
+    hsg: index into hsg_codes, -1: not calculated
+    ndvi, curve_number: timestep series, curve_number_avg: period series with nan for periods without valid values
+    curve_number_stats: CurveNumberStatistics of the curve number series, None if not calculated
+    The landcover, soil, hsg, ndvi, curve_number and curve_number_avg attributes read and assign the previous
+    dictionary/string representations.
+    """
+    __slots__ = ("comid", "region", "valid_catchment", "_hsg", "_landcover", "_soil", "_ndvi", "_curve_number",
+                 "_curve_number_avg", "curve_number_stats")
+
+    def __init__(self, comid, region):
+        self.comid = comid
+        self.region = region
+        self.valid_catchment = True
+        self._hsg = -1
+        self._landcover = None
+        self._soil = None
+        self._ndvi = np.empty(0, dtype=np.float32)
+        self._curve_number = np.empty(0, dtype=np.float64)
+        self._curve_number_avg = np.empty(0, dtype=np.float64)
+        self.curve_number_stats = None
+
+    def __reduce__(self):
+        return restore_catchment_record, (type(self), self.comid, self.region, self.valid_catchment, self._hsg,
+                                          self._landcover, self._soil, self._ndvi, self._curve_number,
+                                          self._curve_number_avg, self.curve_number_stats)
+
+    @property
+    def landcover(self):
+        if self._landcover is None:
+            return None
+        return {k: -1 if v == -1 else float(v) for k, v in zip(nlcd_classes, self._landcover)}
+
+    @landcover.setter
+    def landcover(self, landcover):
+        if landcover is None:
+            self._landcover = None
+        else:
+            self._landcover = np.array([landcover[k] for k in nlcd_classes], dtype=np.float64)
+
+    @property
+    def soil(self):
+        if self._soil is None:
+            return None
+        return {k: float(v) for k, v in zip(soil_types, self._soil)}
+
+    @soil.setter
+    def soil(self, soil):
+        if soil is None:
+            self._soil = None
+        else:
+            self._soil = np.array([soil[k] for k in soil_types], dtype=np.float64)
+
+    @property
+    def hsg(self):
+        return None if self._hsg == -1 else hsg_codes[self._hsg]
+
+    @hsg.setter
+    def hsg(self, hsg):
+        self._hsg = -1 if hsg is None else hsg_codes.index(hsg)
+
+    @property
+    def ndvi(self):
+        return {i: float(v) for i, v in enumerate(self._ndvi)}
+
+    @ndvi.setter
+    def ndvi(self, ndvi):
+        self._ndvi = np.array([ndvi[i] for i in sorted(ndvi)], dtype=np.float32)
+
+    @property
+    def curve_number(self):
+        return {i: float(v) for i, v in enumerate(self._curve_number)}
+
+    @curve_number.setter
+    def curve_number(self, curve_number):
+        self._curve_number = np.array([curve_number[i] for i in sorted(curve_number)], dtype=np.float64)
+
+    @property
+    def curve_number_avg(self):
+        return {i: round(Decimal(float(v)), 4) for i, v in enumerate(self._curve_number_avg) if not np.isnan(v)}
+
+    @curve_number_avg.setter
+    def curve_number_avg(self, curve_number_avg):
+        cn_avg = np.full(timestep_periods, np.nan)
+        for i, v in curve_number_avg.items():
+            cn_avg[i] = float(v)
+        self._curve_number_avg = cn_avg
+
+
+class Catchment(CatchmentRecord):
     """
     Catchment data from epa waters watershed report
     https://watersgeo.epa.gov/watershedreport/?comid=
     """
+    __slots__ = ()
 
-    def __init__(self, ndvi_data, _region):
-        self.comid = ndvi_data["ComID"]
-        self.region = _region
+    def __init__(self, ndvi_data, _region, update_db=True, calculate=True):
+        # calculate=False only sets the landcover, soil, hsg and ndvi data, for calculations with other tables
+        super().__init__(ndvi_data["ComID"], _region)
         self.landcover = None  # NLCD landcover data for the catchment
         self.soil = None  # Statsgo soil data for the catchment
         self.hsg = None  # Hydrologic Soil Group calculated from statsgo soil data
@@ -115,9 +351,13 @@ class Catchment:
         self.curve_number = {}  # Catchments calculated curve number value
         self.curve_number_avg = {}
         self.set_ndvi(ndvi_data)
+        if not calculate:
+            return
         self.calculate_curvenumber()  # Function to calculate curve number
         self.calculate_curvenumber_avg()
-        self.update_database()
+        self.calculate_curvenumber_stats()
+        if update_db:
+            self.update_database()
 
     def set_catchment_data(self):
         """
@@ -174,13 +414,10 @@ class Catchment:
         self.hsg = hsg
 
     def set_ndvi(self, ndvi):
-        _ndvi = {}
-        i = 0
-        for k, v in ndvi.items():
-            if k is not "ComID":
-                _ndvi[i] = float(v)
-                i = i + 1
-        self.ndvi = _ndvi
+        if isinstance(ndvi, NDVIRow):
+            self._ndvi = ndvi.values.astype(np.float32)
+            return
+        self._ndvi = np.array([float(v) for k, v in ndvi.items() if k != "ComID"], dtype=np.float32)
 
     def get_ndvi_class(self, nlcd_class, value):
         ndvi_row = curvenumber_ndvi[nlcd_class]
@@ -199,57 +436,22 @@ class Catchment:
         """
         if not self.valid_catchment:
             return
-        cn = {}
-        k_values = ["41", "42", "43", "52", "71", "81", "82"]
-        for i, ndvi in self.ndvi.items():
-            cn_0 = 0
-            for k, v in self.landcover.items():
-                # k: nlcd class
-                # v: percent value
-                # v = -1: not applicable
-                if v == -1:
-                    cn[i] = -1
-                    continue
-                if k not in k_values:
-                    k_cn = float(curvenumbers[k][self.hsg])
-                else:
-                    if ndvi == -9998:
-                        cn[i] = -1
-                        continue
-                    k_cn = float(curvenumber_conditions[k][self.get_ndvi_class(k, ndvi)][self.hsg])
-                if k_cn == -1:
-                    cn[i] = -1
-                    continue
-                cn_0 = cn_0 + (k_cn * v / 100)
-            if cn_0 == 0:
-                # no valid landcover or request to streamCat produced no data
-                cn_0 = -1
-            elif 0 < cn_0 < 30:
-                cn_0 = 30
-            cn[i] = cn_0
-        self.curve_number = cn
+        self._curve_number = curvenumber_series(self._landcover, self._hsg, self._ndvi, base_tables)[0]
 
     def calculate_curvenumber_avg(self):
         if not self.valid_catchment:
             return
-        cn_avg_0 = {}
-        i = 0
-        for k, v in self.curve_number.items():
-            if i >= 23:
-                i = 0
-            if v == -1:
-                i = i + 1
-                continue
-            else:
-                c = cn_avg_0[i][1] + 1 if i in cn_avg_0 else 1
-                cn_a = cn_avg_0[i][0] + v if i in cn_avg_0 else v
-                cn_avg_0[i] = [cn_a, c]
-            i = i + 1
-        cn_avg = {}
-        for k, v in cn_avg_0.items():
-            cn = v[0] / v[1]
-            cn_avg[k] = round(Decimal(cn), 4)
-        self.curve_number_avg = cn_avg
+        self._curve_number_avg = curvenumber_period_avg(self._curve_number)
+
+    def calculate_curvenumber_stats(self):
+        """
+        Calculate the configured curvenumber_statistics of the curve number series, in a single pass over the series.
+        """
+        if not self.valid_catchment or curvenumber_statistics is None:
+            return
+        stats = CurveNumberStatistics(timestep_periods, curvenumber_statistics, curvenumber_start_year)
+        stats.update(self._curve_number)
+        self.curve_number_stats = stats
 
     def update_database(self):
         if not self.valid_catchment:
@@ -269,6 +471,17 @@ class Catchment:
                 i = "0{}".format(i)
             query = "UPDATE CurveNumber SET CN_{}={} WHERE ComID={}".format(i, cn, self.comid)
             c.execute(query)
+        if self.curve_number_stats is not None:
+            create_statistics_tables(c)
+            stats_query = "INSERT OR REPLACE INTO CurveNumberStats (ComID, Stat, {}) VALUES (?, ?, {})".format(
+                ", ".join("CN_{:02d}".format(i) for i in range(timestep_periods)), ", ".join("?" * timestep_periods))
+            c.executemany(stats_query, [
+                [self.comid, stat] + [None if np.isnan(v) else round(float(v), 4) for v in values]
+                for stat, values in self.curve_number_stats.period_statistics().items()])
+            c.executemany("INSERT OR REPLACE INTO CurveNumberAnnual (ComID, Year, CN, Count, Missing) "
+                          "VALUES (?, ?, ?, ?, ?)",
+                          [(self.comid, year, None if cn is None else round(cn, 4), count, missing)
+                           for year, cn, count, missing in self.curve_number_stats.annual_statistics()])
         c.execute("COMMIT")
         conn.close()
 
@@ -276,21 +489,71 @@ class Catchment:
 # executor = concurrent.futures.ThreadPoolExecutor(max_workers=6)
 
 
-def cn_calculation_region(region):
+def streamcat_files(region):
     """
-    Calculate curve number for all catchments in database.
+    Streamcat region csv files and the zip files they are extracted from
+    :param region: NHDPlus region
+    :return: dictionary of csv file to zip file
+    """
+    return {
+        "Data/NLCD2011_Region{}.csv".format(region): "NLCD2011_Region{}.zip".format(region),
+        "Data/STATSGO_Set1_Region{}.csv".format(region): "STATSGO_Set1_Region{}.zip".format(region)}
+
+
+def import_ndvi_data(region):
+    """
+    Import the catchment ndvi csv file for the region to ndvi_data, or memory map the region ndvi cube if it is
+    current with the csv file (see ndvi_cube.convert_ndvi_csv).
+    :param region: NHDPlus region
     :return: None
     """
+    global ndvi_data
     ndvi_file = "catchment_ndvi_{}.csv".format(region)
+    if cube_current(ndvi_file):
+        print("Loading ndvi cube. Region: {}, File: {}".format(region, ndvi_cube_path(ndvi_file)))
+        ndvi_data = NDVICube(ndvi_cube_path(ndvi_file))
+        return
     with open(ndvi_file, newline='') as csvfile:
         print("Importing ndvi data. Region: {}, File: {}".format(region, ndvi_file))
         data = csv.DictReader(csvfile)
         json_data = {}
         for row in data:
             json_data[row["ComID"]] = row
-        global ndvi_data
         ndvi_data = json_data
         print("Import complete.")
+
+
+def clear_region(region):
+    """
+    Delete the curve number rows of all catchments in the region ndvi data, so they are recalculated.
+    :param region: NHDPlus region
+    :return: None
+    """
+    conn = get_db_connection()
+    c = conn.cursor()
+    tables = [t[0] for t in c.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS RegionComID (ComID INTEGER PRIMARY KEY)")
+    c.execute("BEGIN TRANSACTION")
+    c.execute("DELETE FROM RegionComID")
+    c.executemany("INSERT OR IGNORE INTO RegionComID (ComID) VALUES (?)",
+                  [(int(comid),) for comid, row in ndvi_data.items()])
+    for table in ["CurveNumberRaw", "CurveNumber", "CurveNumberStats", "CurveNumberAnnual"]:
+        if table in tables:
+            c.execute("DELETE FROM {} WHERE ComID IN (SELECT ComID FROM RegionComID)".format(table))
+    c.execute("COMMIT")
+    conn.close()
+    print("Cleared curve numbers. Region: {}".format(region))
+
+
+def cn_calculation_region(region, recalculate=False):
+    """
+    Calculate curve number for all catchments in database.
+    :param recalculate: delete and recalculate catchments already in the database
+    :return: None
+    """
+    import_ndvi_data(region)
+    if recalculate:
+        clear_region(region)
     total = len(ndvi_data)
     i = 1
     for v, row in ndvi_data.items():
@@ -307,13 +570,131 @@ def cn_calculation_region(region):
         i = i + 1
 
 
+def create_statistics_tables(c):
+    """
+    Create the curve number statistics tables. CurveNumberStats has a row for each catchment period statistic with
+    the CurveNumber CN_00 - CN_22 columns, CurveNumberAnnual has a row for each catchment year.
+    :param c: database cursor
+    :return: None
+    """
+    columns = ", ".join("CN_{:02d} REAL".format(i) for i in range(timestep_periods))
+    c.execute("CREATE TABLE IF NOT EXISTS CurveNumberStats "
+              "(ComID INTEGER, Stat TEXT, {}, PRIMARY KEY (ComID, Stat))".format(columns))
+    c.execute("CREATE TABLE IF NOT EXISTS CurveNumberAnnual "
+              "(ComID INTEGER, Year INTEGER, CN REAL, Count INTEGER, Missing INTEGER, PRIMARY KEY (ComID, Year))")
+
+
+def create_scenario_tables(c):
+    """
+    Create the scenario curve number tables, CurveNumberScenarioRaw and CurveNumberScenario, matching
+    CurveNumberRaw and CurveNumber with an additional Scenario column.
+    :param c: database cursor
+    :return: None
+    """
+    c.execute("CREATE TABLE IF NOT EXISTS CurveNumberScenarioRaw "
+              "(Scenario TEXT, ComID INTEGER, TimeStep INTEGER, CN REAL)")
+    c.execute("CREATE INDEX IF NOT EXISTS CurveNumberScenarioRaw_ComID ON CurveNumberScenarioRaw (ComID, Scenario)")
+    columns = ", ".join("CN_{:02d} REAL".format(i) for i in range(timestep_periods))
+    c.execute("CREATE TABLE IF NOT EXISTS CurveNumberScenario "
+              "(Scenario TEXT, ComID INTEGER, {}, PRIMARY KEY (Scenario, ComID))".format(columns))
+
+
+def cn_calculation_scenarios(region, scenarios):
+    """
+    Calculate curve number for all catchments in the region for each scenario, in a single pass over the region data.
+    Streamcat data for the region must be imported with get_streamcat_data.
+    :param region: NHDPlus region
+    :param scenarios: dictionary of scenario name to a dictionary of table file paths, see load_scenarios
+    :return: None
+    """
+    tables = load_scenarios(scenarios)
+    import_ndvi_data(region)
+    avg_query = "INSERT OR REPLACE INTO CurveNumberScenario (Scenario, ComID, {}) VALUES (?, ?, {})".format(
+        ", ".join("CN_{:02d}".format(i) for i in range(timestep_periods)), ", ".join("?" * timestep_periods))
+    conn = get_db_connection()
+    c = conn.cursor()
+    create_scenario_tables(c)
+    total = len(ndvi_data)
+    i = 1
+    for v, row in ndvi_data.items():
+        comid = row["ComID"]
+        c.execute("SELECT COUNT(*) FROM CurveNumberScenario WHERE ComID=? AND Scenario IN ({})".format(
+            ", ".join("?" * len(tables))), [comid] + tables.names)
+        if c.fetchone()[0] == len(tables):
+            print("Catchment: {}/{} already completed. ComID: {}".format(i, total, comid))
+            i = i + 1
+            continue
+        catchment = Catchment(row, region, update_db=False, calculate=False)
+        if not catchment.valid_catchment:
+            print("Invalid Catchment. Not found in streamcat data. ComID: {}".format(comid))
+            i = i + 1
+            continue
+        cn = curvenumber_series(catchment._landcover, catchment._hsg, catchment._ndvi, tables)
+        cn_avg = curvenumber_period_avg(cn)
+        c.execute("BEGIN TRANSACTION")
+        c.execute("DELETE FROM CurveNumberScenarioRaw WHERE ComID=? AND Scenario IN ({})".format(
+            ", ".join("?" * len(tables))), [comid] + tables.names)
+        for s, name in enumerate(tables.names):
+            c.executemany("INSERT INTO CurveNumberScenarioRaw (Scenario, ComID, TimeStep, CN) VALUES (?, ?, ?, ?)",
+                          [(name, comid, t, float(v)) for t, v in enumerate(cn[s])])
+            c.execute(avg_query, [name, comid] + [None if np.isnan(v) else round(float(v), 4) for v in cn_avg[s]])
+        c.execute("COMMIT")
+        print("Completed: {}/{}, ComID: {}".format(i, total, comid))
+        i = i + 1
+    conn.close()
+
+
+def cn_calculation_catchments(region, comids, update_db=False):
+    """
+    Calculate curve number for the specified catchments in a region, reading only the rows of those catchments
+    from the region files through the region file indexes.
+    :param region: NHDPlus region
+    :param comids: list of catchment comids
+    :param update_db: add the calculated curve numbers to the database, catchments already in the database are skipped
+    :return: dictionary of the calculated catchments keyed by comid
+    """
+    files = streamcat_files(region)
+    get_streamcat_data(files, import_data=False)
+    nlcd_file, statsgo_file = files.keys()
+    ndvi_file = "catchment_ndvi_{}.csv".format(region)
+    if cube_current(ndvi_file):
+        cube = NDVICube(ndvi_cube_path(ndvi_file))
+        catchment_ndvi = {str(comid): cube[comid] for comid in comids if comid in cube}
+    else:
+        catchment_ndvi = RegionIndex(ndvi_file, "ComID").read_rows(comids)
+    # Catchment reads the streamcat rows from region_nlcd and region_statsgo, the imported region data is restored
+    # after the calculation
+    global region_nlcd, region_statsgo
+    imported_nlcd, imported_statsgo = region_nlcd, region_statsgo
+    catchments = {}
+    try:
+        region_nlcd = RegionIndex(nlcd_file, "COMID").read_rows(comids)
+        region_statsgo = RegionIndex(statsgo_file, "COMID").read_rows(comids)
+        for comid, row in catchment_ndvi.items():
+            if update_db:
+                conn = get_db_connection()
+                c = conn.cursor()
+                c.execute("SELECT ComID FROM CurveNumber WHERE ComID={}".format(comid))
+                db_v = c.fetchall()
+                conn.close()
+                if len(db_v) > 0:
+                    print("Catchment already completed. ComID: {}".format(comid))
+                    continue
+            catchment = Catchment(row, region, update_db)
+            catchments[comid] = catchment
+            print("ComID: {}, HSG: {}, CN: {}".format(comid, catchment.hsg, catchment.curve_number_avg))
+    finally:
+        region_nlcd, region_statsgo = imported_nlcd, imported_statsgo
+    for comid in comids:
+        if str(comid) not in catchment_ndvi:
+            print("Catchment not found in ndvi data. ComID: {}".format(comid))
+    return catchments
+
+
 def main():
     region = "17"
 
-    files = {
-        "Data/NLCD2011_Region{}.csv".format(region): "NLCD2011_Region{}.zip".format(region),
-        "Data/STATSGO_Set1_Region{}.csv".format(region): "STATSGO_Set1_Region{}.zip".format(region)}
-    get_streamcat_data(files)
+    get_streamcat_data(streamcat_files(region))
 
     cn_calculation_region(region)
 
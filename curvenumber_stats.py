@@ -0,0 +1,138 @@
+import numpy as np
+
+
+# Statistics of a catchment curve number timestep series, computed in a single pass over the timesteps.
+# Period statistics (one value per timestep period):
+#   count: number of valid timesteps, missing: number of -1 timesteps, min, max, mean, std (population),
+#   pNN: NNth percentile (e.g. p10, p50, p90)
+# Annual statistics (one value per year): annual (mean, valid and missing count of the year)
+
+default_statistics = ["count", "missing", "min", "max", "mean", "std", "p10", "p50", "p90", "annual"]
+
+
+def percentile_value(stat):
+    """
+    Percentile of a pNN statistic name, None if stat is not a percentile
+    """
+    if stat.startswith("p") and stat[1:].replace(".", "", 1).isdigit():
+        return float(stat[1:])
+    return None
+
+
+class CurveNumberStatistics:
+    """
+    Streaming statistics of a curve number timestep series, per timestep period and per year.
+    Timesteps are added in order with update, in chunks of any size. Mean and standard deviation use Welford's
+    online algorithm. The values of each period are kept in a (year, period) sample array, filled in the same
+    pass, from which percentiles are exact; a period holds at most one value per year so no approximation is needed.
+    """
+
+    def __init__(self, periods=23, statistics=None, start_year=2001):
+        self.periods = periods
+        self.statistics = default_statistics if statistics is None else statistics
+        for stat in self.statistics:
+            if stat in default_statistics:
+                continue
+            q = percentile_value(stat)
+            if q is None:
+                raise ValueError("Unknown curve number statistic: {}".format(stat))
+            if not 0 <= q <= 100:
+                raise ValueError("Curve number percentile out of range 0-100: {}".format(stat))
+        self.start_year = start_year
+        self.timestep = 0
+        self.count = np.zeros(periods, dtype=np.int64)
+        self.missing = np.zeros(periods, dtype=np.int64)
+        self.min = np.full(periods, np.inf)
+        self.max = np.full(periods, -np.inf)
+        self.mean = np.zeros(periods)
+        self.m2 = np.zeros(periods)
+        self.samples = []
+        self.annual_sum = []
+        self.annual_count = []
+        self.annual_missing = []
+
+    def update(self, values):
+        """
+        Add the next timesteps of the series.
+        :param values: curve number values, -1 for timesteps without a curve number
+        :return: None
+        """
+        values = np.asarray(values, dtype=np.float64)
+        while values.size > 0:
+            start = self.timestep % self.periods
+            n = min(self.periods - start, values.size)
+            self.update_year(values[:n], start)
+            values = values[n:]
+
+    def update_year(self, values, start):
+        """
+        Add timesteps within a single year, each period occurs at most once.
+        """
+        if start == 0:
+            self.samples.append(np.full(self.periods, np.nan))
+            self.annual_sum.append(0.0)
+            self.annual_count.append(0)
+            self.annual_missing.append(0)
+        valid = values != -1
+        i = np.arange(start, start + values.size)[valid]
+        x = values[valid]
+        self.missing[start:start + values.size] += ~valid
+        self.count[i] += 1
+        delta = x - self.mean[i]
+        self.mean[i] += delta / self.count[i]
+        self.m2[i] += delta * (x - self.mean[i])
+        self.min[i] = np.minimum(self.min[i], x)
+        self.max[i] = np.maximum(self.max[i], x)
+        self.samples[-1][i] = x
+        self.annual_sum[-1] += x.sum()
+        self.annual_count[-1] += x.size
+        self.annual_missing[-1] += values.size - x.size
+        self.timestep += values.size
+
+    def period_statistics(self):
+        """
+        :return: dictionary of statistic name to an array with a value for each period, nan where the period has
+        no valid values
+        """
+        has_values = self.count > 0
+        results = {}
+        for stat in self.statistics:
+            if stat == "count":
+                results[stat] = self.count.astype(np.float64)
+            elif stat == "missing":
+                results[stat] = self.missing.astype(np.float64)
+            elif stat == "min":
+                results[stat] = np.where(has_values, self.min, np.nan)
+            elif stat == "max":
+                results[stat] = np.where(has_values, self.max, np.nan)
+            elif stat == "mean":
+                results[stat] = np.where(has_values, self.mean, np.nan)
+            elif stat == "std":
+                std = np.full(self.periods, np.nan)
+                np.divide(self.m2, self.count, out=std, where=has_values)
+                results[stat] = np.sqrt(std)
+            elif stat != "annual":
+                results[stat] = self.percentile(percentile_value(stat))
+        return results
+
+    def percentile(self, q):
+        values = np.full(self.periods, np.nan)
+        if self.samples:
+            samples = np.vstack(self.samples)
+            for i in np.nonzero(self.count > 0)[0]:
+                column = samples[:, i]
+                values[i] = np.percentile(column[~np.isnan(column)], q)
+        return values
+
+    def annual_statistics(self):
+        """
+        :return: list of (year, mean, valid count, missing count) tuples, mean is None for years without valid values
+        """
+        if "annual" not in self.statistics:
+            return []
+        annual = []
+        for y in range(len(self.annual_sum)):
+            count = self.annual_count[y]
+            mean = self.annual_sum[y] / count if count > 0 else None
+            annual.append((self.start_year + y, mean, count, self.annual_missing[y]))
+        return annual
@@ -2,6 +2,7 @@ import sqlite3
 import csv
 import pandas as pd
 import multiprocessing as mp
+from ndvi_cube import NDVICube, cube_current, ndvi_cube_path
 
 results = []
 ndvi_missing = []
@@ -18,6 +19,7 @@ class HUCData:
         self.columns = None
         self.data_total = 0
         self.ndvi_data = None
+        self.ndvi_cubes = None
         self.load_comids()
         self.data = None
 
@@ -38,6 +40,10 @@ class HUCData:
             columns.append(n)
         self.columns = columns
         self.data = pd.DataFrame(columns=columns)
+        if all(cube_current(f) for f in self.ndvi_file):
+            # memory mapped ndvi cubes, shared by the worker processes
+            self.ndvi_cubes = [NDVICube(ndvi_cube_path(f)) for f in self.ndvi_file]
+            return
         df_full = None
         for f in self.ndvi_file:
             df = pd.read_csv(f)
@@ -128,6 +134,12 @@ class HUCData:
         return values
 
     def query_ndvi(self, comid):
+        if self.ndvi_cubes is not None:
+            for cube in self.ndvi_cubes:
+                row = cube.csv_row(comid)
+                if row is not None:
+                    return pd.DataFrame([row], columns=cube.columns)
+            return pd.DataFrame(columns=self.ndvi_cubes[0].columns)
         query = "ComID == {}".format(comid)
         values = self.ndvi_data.query(query)
         return values
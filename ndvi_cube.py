@@ -0,0 +1,198 @@
+import numpy as np
+import json
+import csv
+import os
+import sys
+
+
+# Binary NDVI cube of a catchment_ndvi_{region}.csv file, read through memory mapping.
+# File layout: one json header line (padded to 8 bytes), the sorted int64 comid index (count),
+# followed by the ndvi data (count, timesteps) as int16, or float32 if the csv has non integer values.
+# Missing ndvi values keep the -9998 sentinel of the csv file.
+
+cube_extension = ".ndvi"
+cube_version = 1
+ndvi_sentinel = -9998
+
+
+def ndvi_cube_path(csv_path):
+    return "{}{}".format(os.path.splitext(csv_path)[0], cube_extension)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        return json.loads(f.readline().decode('utf-8'))
+
+
+def cube_current(csv_path):
+    """
+    Check for a ndvi cube of the csv file, converted from the current version of the csv file.
+    The cube is used on its own if the csv file no longer exists.
+    :param csv_path: catchment ndvi csv file
+    :return: True if the cube exists and is current
+    """
+    cube_path = ndvi_cube_path(csv_path)
+    if not os.path.isfile(cube_path):
+        return False
+    header = read_header(cube_path)
+    if header["version"] != cube_version:
+        return False
+    if not os.path.isfile(csv_path):
+        return True
+    stat = os.stat(csv_path)
+    return header["size"] == stat.st_size and header["mtime"] == stat.st_mtime_ns
+
+
+def convert_ndvi_csv(csv_path, key="ComID", chunk_size=10000):
+    """
+    Convert a catchment ndvi csv file to a ndvi cube, in a streaming pass over the csv file.
+    :param csv_path: catchment ndvi csv file
+    :param key: comid column of the csv file
+    :param chunk_size: number of rows copied at a time when sorting the cube by comid
+    :return: path of the ndvi cube
+    """
+    cube_path = ndvi_cube_path(csv_path)
+    # the cube is built at build_path and only moved to cube_path once complete, an interrupted conversion never
+    # leaves a partial cube that cube_current accepts
+    tmp_path = "{}.rows.tmp".format(cube_path)
+    build_path = "{}.tmp".format(cube_path)
+    print("Converting {} to {}".format(csv_path, cube_path))
+    comids = []
+    integers = True
+    with open(csv_path, newline='') as f, open(tmp_path, 'wb') as tmp:
+        data = csv.reader(f)
+        columns = next(data)
+        key_i = columns.index(key)
+        dates = columns[:key_i] + columns[key_i + 1:]
+        for row in data:
+            if not row:
+                continue
+            comids.append(int(float(row[key_i])))
+            values = np.array(row[:key_i] + row[key_i + 1:], dtype=np.float32)
+            if integers and not (np.all(np.round(values) == values) and
+                                 np.all(np.abs(values) <= np.iinfo(np.int16).max)):
+                integers = False
+            values.tofile(tmp)
+    count = len(comids)
+    timesteps = len(dates)
+    dtype = np.int16 if integers else np.float32
+    stat = os.stat(csv_path)
+    header = {"version": cube_version, "dtype": np.dtype(dtype).name, "count": count, "timesteps": timesteps,
+              "dates": dates, "columns": columns, "key": key, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_length = -(-(len(header_bytes) + 1) // 8) * 8
+    header_bytes = header_bytes + b" " * (header_length - len(header_bytes) - 1) + b"\n"
+
+    order = np.argsort(np.array(comids, dtype=np.int64), kind="stable")
+    with open(build_path, 'wb') as f:
+        f.write(header_bytes)
+        np.array(comids, dtype=np.int64)[order].tofile(f)
+        f.truncate(header_length + count * 8 + count * timesteps * np.dtype(dtype).itemsize)
+    if count > 0:
+        source = np.memmap(tmp_path, dtype=np.float32, mode='r', shape=(count, timesteps))
+        cube = np.memmap(build_path, dtype=dtype, mode='r+', offset=header_length + count * 8,
+                         shape=(count, timesteps))
+        for i in range(0, count, chunk_size):
+            cube[i:i + chunk_size] = source[order[i:i + chunk_size]].astype(dtype)
+        cube.flush()
+        del source, cube
+    os.replace(build_path, cube_path)
+    os.remove(tmp_path)
+    print("Conversion complete. Catchments: {}, Timesteps: {}".format(count, timesteps))
+    return cube_path
+
+
+class NDVIRow:
+    """
+    Ndvi timestep series of a single catchment from a ndvi cube.
+    row["ComID"] returns the comid, the same as a catchment ndvi csv row.
+    """
+    __slots__ = ("comid", "values")
+
+    def __init__(self, comid, values):
+        self.comid = comid
+        self.values = values
+
+    def __getitem__(self, key):
+        if key == "ComID":
+            return self.comid
+        raise KeyError(key)
+
+
+class NDVICube:
+    """
+    Memory mapped ndvi cube. Catchments are looked up by comid in the sorted comid index.
+    Pickles by path, so worker processes map the same file and share the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        header = read_header(path)
+        with open(path, 'rb') as f:
+            header_length = len(f.readline())
+        self.dates = header["dates"]
+        self.columns = header["columns"]
+        self.key = header["key"]
+        count = header["count"]
+        if count > 0:
+            self.comids = np.memmap(path, dtype=np.int64, mode='r', offset=header_length, shape=(count,))
+            self.data = np.memmap(path, dtype=np.dtype(header["dtype"]), mode='r', offset=header_length + count * 8,
+                                  shape=(count, header["timesteps"]))
+        else:
+            self.comids = np.empty(0, dtype=np.int64)
+            self.data = np.empty((0, header["timesteps"]), dtype=np.dtype(header["dtype"]))
+
+    def __reduce__(self):
+        return NDVICube, (self.path,)
+
+    def __len__(self):
+        return self.comids.size
+
+    def index(self, comid):
+        """
+        :return: row index of comid in the cube, None if the comid is not in the cube
+        """
+        comid = int(comid)
+        i = int(np.searchsorted(self.comids, comid))
+        if i == self.comids.size or self.comids[i] != comid:
+            return None
+        return i
+
+    def __contains__(self, comid):
+        return self.index(comid) is not None
+
+    def __getitem__(self, comid):
+        i = self.index(comid)
+        if i is None:
+            raise KeyError(comid)
+        return NDVIRow(str(comid), self.data[i])
+
+    def get(self, comid, default=None):
+        i = self.index(comid)
+        return default if i is None else NDVIRow(str(comid), self.data[i])
+
+    def items(self):
+        for i in range(self.comids.size):
+            comid = str(self.comids[i])
+            yield comid, NDVIRow(comid, self.data[i])
+
+    def csv_row(self, comid):
+        """
+        Values of the catchment in the column order of the source csv file, including the comid column.
+        :return: list of values, None if the comid is not in the cube
+        """
+        i = self.index(comid)
+        if i is None:
+            return None
+        values = self.data[i].tolist()
+        values.insert(self.columns.index(self.key), int(comid))
+        return values
+
+
+def main():
+    for csv_path in sys.argv[1:]:
+        convert_ndvi_csv(csv_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from array import array
+from bisect import bisect_left
+import json
+import csv
+import os
+import sys
+
+
+# Sidecar byte offset index for the region csv files (streamcat NLCD/STATSGO and catchment ndvi).
+# Index file layout: one json header line, followed by three int64 arrays of length count
+# (sorted comids, row byte offsets, row byte lengths).
+# The header records the size and mtime of the csv file, a changed csv file invalidates the index.
+
+index_extension = ".idx"
+index_version = 1
+
+
+def index_path(path):
+    return "{}{}".format(path, index_extension)
+
+
+class RegionIndex:
+    """
+    COMID to byte offset/length index of a region csv file, used to read single catchment rows
+    without importing the entire region file.
+    """
+
+    def __init__(self, path, key="COMID"):
+        self.path = path
+        self.key = key
+        self.columns = None
+        self.comids = array('q')
+        self.offsets = array('q')
+        self.lengths = array('q')
+        if not self.load():
+            self.build()
+
+    def file_state(self):
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def load(self):
+        """
+        Load the sidecar index file, if it exists and is current with the csv file.
+        :return: True if the index was loaded, False if it is missing, outdated or unreadable and must be rebuilt
+        """
+        idx_file = index_path(self.path)
+        if not os.path.isfile(idx_file):
+            return False
+        comids, offsets, lengths = array('q'), array('q'), array('q')
+        try:
+            with open(idx_file, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                state = self.file_state()
+                if header.get("version") != index_version or header["key"] != self.key or \
+                        header["byteorder"] != sys.byteorder or header["size"] != state["size"] or \
+                        header["mtime"] != state["mtime"]:
+                    return False
+                count = header["count"]
+                for values in (comids, offsets, lengths):
+                    values.fromfile(f, count)
+        except (EOFError, ValueError, KeyError) as e:
+            print("Unreadable index {}: {}".format(idx_file, e))
+            return False
+        self.comids, self.offsets, self.lengths = comids, offsets, lengths
+        self.columns = header["columns"]
+        return True
+
+    def build(self):
+        """
+        Build the index in a single streaming pass over the csv file and write the sidecar index file.
+        :return: None
+        """
+        print("Building index for {}".format(self.path))
+        rows = []
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            self.columns = next(csv.reader([header.decode('utf-8-sig')]))
+            key_i = self.columns.index(self.key)
+            offset = len(header)
+            for line in f:
+                if line.strip():
+                    row = next(csv.reader([line.decode('utf-8')]))
+                    rows.append((int(float(row[key_i])), offset, len(line)))
+                offset = offset + len(line)
+        rows.sort()
+        self.comids = array('q', [r[0] for r in rows])
+        self.offsets = array('q', [r[1] for r in rows])
+        self.lengths = array('q', [r[2] for r in rows])
+        header = self.file_state()
+        header.update({"version": index_version, "key": self.key, "byteorder": sys.byteorder,
+                       "columns": self.columns, "count": len(rows)})
+        # written to a temp file and moved into place, an interrupted build never leaves a partial index
+        tmp_file = "{}.tmp".format(index_path(self.path))
+        with open(tmp_file, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8'))
+            f.write(b"\n")
+            for values in (self.comids, self.offsets, self.lengths):
+                values.tofile(f)
+        os.replace(tmp_file, index_path(self.path))
+        print("Index complete. Rows: {}".format(len(rows)))
+
+    def __len__(self):
+        return len(self.comids)
+
+    def __contains__(self, comid):
+        return self.lookup(comid) is not None
+
+    def lookup(self, comid):
+        """
+        Get the byte offset and length of the row for comid
+        :param comid: Catchment comid
+        :return: (offset, length) tuple, None if comid is not in the file
+        """
+        comid = int(comid)
+        i = bisect_left(self.comids, comid)
+        if i == len(self.comids) or self.comids[i] != comid:
+            return None
+        return self.offsets[i], self.lengths[i]
+
+    def read_rows(self, comids):
+        """
+        Read the rows for the requested comids, seeking directly to each row.
+        :param comids: list of catchment comids
+        :return: dictionary of csv rows keyed by comid, same as a csv.DictReader row. Missing comids are excluded.
+        """
+        rows = {}
+        with open(self.path, 'rb') as f:
+            for comid in comids:
+                position = self.lookup(comid)
+                if position is None:
+                    continue
+                f.seek(position[0])
+                line = f.read(position[1]).decode('utf-8')
+                row = dict(zip(self.columns, next(csv.reader([line]))))
+                rows[row[self.key]] = row
+        return rows
@@ -0,0 +1,222 @@
+from zipfile import ZipFile
+import hashlib
+import time
+import os
+import curve_number_streamcat_01 as cn
+
+
+# Region manifest for curvenumber.sqlite3, recording the inputs that produced the curve numbers of each region.
+# A region is scheduled for (re)calculation when any of its input hashes or the code version changed.
+# File hashes are cached by path, size and mtime in InputHash, so unchanged files are not rehashed.
+# The streamcat zip files are hashed with the extracted csv files, get_streamcat_data only extracts a zip when the csv
+# is missing so a refreshed zip is extracted by refresh_regions. A missing zip (removed after extraction) is ignored.
+
+table_files = {"CurveNumberHash": "curvenumber.json",
+               "ConditionsHash": "curvenumber_conditions.json",
+               "NDVIThresholdHash": "curvenumber_ndvi.json"}
+# region_index.py is not included, it is only used for single catchment lookups, not region calculations
+code_files = ["curve_number_streamcat_01.py", "curvenumber_stats.py", "ndvi_cube.py"]
+zip_columns = {"NLCDHash": "NLCDZipHash", "STATSGOHash": "STATSGOZipHash"}
+hash_columns = ["NLCDZipHash", "NLCDHash", "STATSGOZipHash", "STATSGOHash", "NDVIHash"] + list(table_files.keys()) + \
+               ["CodeVersion"]
+
+
+def create_manifest_tables(c):
+    """
+    Create the CurveNumberManifest and InputHash tables
+    :param c: database cursor
+    :return: None
+    """
+    columns = ", ".join("{} TEXT".format(h) for h in hash_columns)
+    c.execute("CREATE TABLE IF NOT EXISTS CurveNumberManifest "
+              "(Region TEXT PRIMARY KEY, {}, RawRows INTEGER, Rows INTEGER, Updated TEXT)".format(columns))
+    column_names = [col[1] for col in c.execute("PRAGMA TABLE_INFO('CurveNumberManifest')").fetchall()]
+    for h in hash_columns:
+        if h not in column_names:
+            c.execute("ALTER TABLE CurveNumberManifest ADD {} TEXT".format(h))
+    c.execute("CREATE TABLE IF NOT EXISTS InputHash (Path TEXT PRIMARY KEY, Size INTEGER, MTime INTEGER, Hash TEXT)")
+
+
+def file_hash(c, path):
+    """
+    sha256 hash of a file, reusing the cached hash if the size and mtime of the file are unchanged.
+    :param c: database cursor
+    :param path: file path
+    :return: hex digest, None if the file does not exist
+    """
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    c.execute("SELECT Hash FROM InputHash WHERE Path=? AND Size=? AND MTime=?", (path, stat.st_size, stat.st_mtime_ns))
+    cached = c.fetchone()
+    if cached is not None:
+        return cached[0]
+    print("Hashing {}".format(path))
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+    c.execute("INSERT OR REPLACE INTO InputHash (Path, Size, MTime, Hash) VALUES (?, ?, ?, ?)",
+              (path, stat.st_size, stat.st_mtime_ns, digest))
+    return digest
+
+
+def code_version(c):
+    """
+    Combined hash of the curve number calculation source files
+    """
+    sha = hashlib.sha256()
+    for path in code_files:
+        sha.update((file_hash(c, path) or "").encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+def region_inputs(c, region):
+    """
+    Hashes of the current inputs of a region
+    :param c: database cursor
+    :param region: NHDPlus region
+    :return: dictionary of manifest hash column to hash, None for inputs that do not exist yet
+    """
+    (nlcd_file, nlcd_zip), (statsgo_file, statsgo_zip) = cn.streamcat_files(region).items()
+    ndvi_file = "catchment_ndvi_{}.csv".format(region)
+    if not os.path.isfile(ndvi_file) and os.path.isfile(cn.ndvi_cube_path(ndvi_file)):
+        ndvi_file = cn.ndvi_cube_path(ndvi_file)
+    inputs = {"NLCDZipHash": file_hash(c, "Data/{}".format(nlcd_zip)),
+              "NLCDHash": file_hash(c, nlcd_file),
+              "STATSGOZipHash": file_hash(c, "Data/{}".format(statsgo_zip)),
+              "STATSGOHash": file_hash(c, statsgo_file),
+              "NDVIHash": file_hash(c, ndvi_file)}
+    for column, path in table_files.items():
+        inputs[column] = file_hash(c, path)
+    inputs["CodeVersion"] = code_version(c)
+    return inputs
+
+
+def plan_regions(regions):
+    """
+    Compare the current inputs of each region to the manifest.
+    :param regions: list of NHDPlus regions
+    :return: list of (region, inputs, changed hash columns) for the regions without a manifest entry or with
+    changed inputs
+    """
+    conn = cn.get_db_connection()
+    c = conn.cursor()
+    create_manifest_tables(c)
+    plan = []
+    for region in regions:
+        inputs = region_inputs(c, region)
+        c.execute("SELECT {} FROM CurveNumberManifest WHERE Region=?".format(", ".join(hash_columns)), (region,))
+        recorded = c.fetchone()
+        if recorded is None:
+            print("Region: {}, not in manifest.".format(region))
+            plan.append((region, inputs, hash_columns))
+            continue
+        changed = []
+        for h, v in zip(hash_columns, recorded):
+            if h in zip_columns.values() and inputs[h] is None:
+                continue
+            if inputs[h] is None or inputs[h] != v:
+                changed.append(h)
+        if len(changed) > 0:
+            print("Region: {}, changed: {}".format(region, ", ".join(changed)))
+            plan.append((region, inputs, changed))
+        else:
+            print("Region: {}, unchanged.".format(region))
+    conn.close()
+    return plan
+
+
+def record_region(region, inputs):
+    """
+    Add the region inputs and curve number row counts to the manifest. Region ndvi data must be imported.
+    :param region: NHDPlus region
+    :param inputs: region input hashes of the calculation, from region_inputs
+    :return: None
+    """
+    conn = cn.get_db_connection()
+    c = conn.cursor()
+    create_manifest_tables(c)
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS RegionComID (ComID INTEGER PRIMARY KEY)")
+    c.execute("BEGIN TRANSACTION")
+    c.execute("DELETE FROM RegionComID")
+    c.executemany("INSERT OR IGNORE INTO RegionComID (ComID) VALUES (?)",
+                  [(int(comid),) for comid, row in cn.ndvi_data.items()])
+    c.execute("SELECT COUNT(*) FROM CurveNumberRaw WHERE ComID IN (SELECT ComID FROM RegionComID)")
+    raw_rows = c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM CurveNumber WHERE ComID IN (SELECT ComID FROM RegionComID)")
+    rows = c.fetchone()[0]
+    c.execute("INSERT OR REPLACE INTO CurveNumberManifest (Region, {}, RawRows, Rows, Updated) "
+              "VALUES (?, {}, ?, ?, ?)".format(", ".join(hash_columns), ", ".join("?" * len(hash_columns))),
+              [region] + [inputs[h] for h in hash_columns] + [raw_rows, rows, time.strftime("%Y-%m-%d %H:%M:%S")])
+    c.execute("COMMIT")
+    conn.close()
+    print("Region: {}, added to manifest. CurveNumberRaw rows: {}, CurveNumber rows: {}".format(
+        region, raw_rows, rows))
+
+
+def extract_changed_zips(region, changed):
+    """
+    Extract the streamcat zip files that changed since the region was recorded, replacing the extracted csv files.
+    :param region: NHDPlus region
+    :param changed: changed hash columns, from plan_regions
+    :return: None
+    """
+    for (csv_file, zip_file), column in zip(cn.streamcat_files(region).items(), zip_columns.values()):
+        zip_path = "Data/{}".format(zip_file)
+        if column in changed and os.path.isfile(zip_path):
+            print("Extracting {}".format(zip_path))
+            with ZipFile(zip_path) as zipfile:
+                zipfile.extractall("Data")
+
+
+def current_inputs(region):
+    conn = cn.get_db_connection()
+    c = conn.cursor()
+    inputs = region_inputs(c, region)
+    conn.close()
+    return inputs
+
+
+def refresh_regions(regions):
+    """
+    Recalculate curve numbers for the regions with changed inputs, and update the manifest.
+    :param regions: list of NHDPlus regions
+    Regions without ndvi data are skipped, a failed region does not stop the remaining regions.
+    :return: list of the recalculated regions
+    """
+    plan = plan_regions(regions)
+    recalculated = []
+    failed = []
+    for region, inputs, changed in plan:
+        if inputs["NDVIHash"] is None:
+            print("Region: {}, ndvi data not found, skipped.".format(region))
+            failed.append(region)
+            continue
+        try:
+            extract_changed_zips(region, changed)
+            cn.get_streamcat_data(cn.streamcat_files(region))
+            # inputs after download and extraction
+            inputs = current_inputs(region)
+            cn.cn_calculation_region(region, recalculate=True)
+            record_region(region, inputs)
+        except Exception as e:
+            print("Region: {}, refresh failed: {}".format(region, e))
+            failed.append(region)
+            continue
+        recalculated.append(region)
+    print("Refresh complete. Recalculated regions: {}".format(", ".join(recalculated)))
+    if len(failed) > 0:
+        print("Regions not refreshed: {}".format(", ".join(failed)))
+    return recalculated
+
+
+def main():
+    regions = ["01", "02", "03N", "03S", "03W", "04", "05", "06", "07_1", "07_2", "08", "09", "10L_1", "10L_2",
+               "10U_1", "10U_2", "11_1", "11_2", "12", "13", "14", "15", "16", "17", "18"]
+    refresh_regions(regions)
+
+
+if __name__ == "__main__":
+    main()
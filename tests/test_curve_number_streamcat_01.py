@@ -0,0 +1,96 @@
+from decimal import Decimal
+import random
+import os
+import sys
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+os.chdir(repo_dir)  # curve number tables are loaded relative to the working directory
+
+import curve_number_streamcat_01 as cn
+
+
+def legacy_curvenumber(landcover, hsg, ndvi_values):
+    """
+    Catchment.calculate_curvenumber and calculate_curvenumber_avg from before the array backed catchment record.
+    """
+    k_values = ["41", "42", "43", "52", "71", "81", "82"]
+    curve_number = {}
+    for i, ndvi in ndvi_values.items():
+        cn_0 = 0
+        for k, v in landcover.items():
+            if v == -1:
+                continue
+            if k not in k_values:
+                k_cn = float(cn.curvenumbers[k][hsg])
+            else:
+                if ndvi == -9998:
+                    continue
+                ndvi_row = cn.curvenumber_ndvi[k]
+                if ndvi <= float(ndvi_row["POOR"]):
+                    condition = "POOR"
+                elif float(ndvi_row["POOR"]) < ndvi < float(ndvi_row["GOOD"]):
+                    condition = "FAIR"
+                else:
+                    condition = "GOOD"
+                k_cn = float(cn.curvenumber_conditions[k][condition][hsg])
+            if k_cn == -1:
+                continue
+            cn_0 = cn_0 + (k_cn * v / 100)
+        if cn_0 == 0:
+            cn_0 = -1
+        elif 0 < cn_0 < 30:
+            cn_0 = 30
+        curve_number[i] = cn_0
+    cn_avg_0 = {}
+    for i, v in curve_number.items():
+        p = i % 23
+        if v == -1:
+            continue
+        c = cn_avg_0[p][1] + 1 if p in cn_avg_0 else 1
+        cn_a = cn_avg_0[p][0] + v if p in cn_avg_0 else v
+        cn_avg_0[p] = [cn_a, c]
+    curve_number_avg = {k: round(Decimal(v[0] / v[1]), 4) for k, v in cn_avg_0.items()}
+    return curve_number, curve_number_avg
+
+
+def random_catchment(rng):
+    landcover = {k: -1 for k in cn.nlcd_classes}
+    streamcat_classes = [k for k in cn.nlcd_classes if k not in ["51", "72", "73", "74"]]
+    weights = [rng.random() for k in streamcat_classes]
+    for k, w in zip(streamcat_classes, weights):
+        # streamcat percentages are parsed from 2 decimal csv values
+        landcover[k] = float("{:.2f}".format(w / sum(weights) * 100))
+    ndvi = {i: float(rng.choice([-9998, rng.randint(-2000, 10000)])) for i in range(391)}
+    return landcover, rng.choice(cn.hsg_codes), ndvi
+
+
+def test_curvenumber_matches_legacy_calculation():
+    rng = random.Random(2011)
+    for n in range(200):
+        landcover, hsg, ndvi = random_catchment(rng)
+        record = cn.CatchmentRecord(str(n), "17")
+        record.landcover = landcover
+        record.hsg = hsg
+        record.ndvi = ndvi
+        curve_number, curve_number_avg = legacy_curvenumber(landcover, hsg, ndvi)
+
+        series = cn.curvenumber_series(record._landcover, record._hsg, record._ndvi, cn.base_tables)
+        assert series.shape == (1, 391)
+        assert series[0].tolist() == [curve_number[i] for i in range(391)]
+        record._curve_number = series[0]
+        record._curve_number_avg = cn.curvenumber_period_avg(series[0])
+        assert record.curve_number_avg == curve_number_avg
+
+
+def test_catchment_record_pickle():
+    import pickle
+    rng = random.Random(17)
+    landcover, hsg, ndvi = random_catchment(rng)
+    record = cn.CatchmentRecord("42", "17")
+    record.landcover = landcover
+    record.hsg = hsg
+    record.ndvi = ndvi
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored.comid == "42" and restored.hsg == hsg
+    assert restored.landcover == landcover and restored.ndvi == ndvi